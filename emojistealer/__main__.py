@@ -1,13 +1,14 @@
 # SPDX-License-Identifier: MIT
 
 from . import VERSION, logger
-from .utils import colors
-from .request import request_download, RequestError
+from .utils import colors, json_dumps
+from .request import request_download_many
 from .instance import Instance
 
 import argparse
+import os
 import os.path
-import json
+from collections import defaultdict
 
 parser = argparse.ArgumentParser(
     prog="emojistealer",
@@ -44,7 +45,7 @@ logger.info(
 
 logger.info(f"Getting emoji list...")
 all_emoji = instance.all_emoji
-all_emoji_shortcodes = dict([(e.shortcode, e) for e in all_emoji])
+all_emoji_shortcodes = {e.shortcode: e for e in all_emoji}
 
 if not all_emoji:
     logger.error(
@@ -52,13 +53,9 @@ if not all_emoji:
     )
     quit(1)
 
-emoji_categorized = {}
+emoji_categorized = defaultdict(list)
 for emoji in all_emoji:
-    category = emoji.category or "(uncategorized)"
-    if category in emoji_categorized:
-        emoji_categorized[category].append(emoji)
-    else:
-        emoji_categorized[category] = [emoji]
+    emoji_categorized[emoji.category_display].append(emoji)
 
 logger.info(f"Available emoji:\n")
 for category, category_emoji in sorted(emoji_categorized.items()):
@@ -78,6 +75,47 @@ logger.info(" quit - quits the program")
 
 selected = {}
 
+
+def apply_emoji(name: str, unselect: bool = False):
+    """Select or unselect a single emoji by shortcode."""
+    if unselect:
+        if selected.pop(name, None) is None:
+            logger.warn(f"Not selected: {name}, ignoring")
+    else:
+        try:
+            selected[name] = all_emoji_shortcodes[name]
+        except KeyError:
+            logger.warn(f"No such emoji: {name}, ignoring")
+
+
+def apply_pack(name: str, unselect: bool = False):
+    """Select or unselect an entire pack/category by name."""
+    pack_emoji = emoji_categorized.get(name, ())
+    if not pack_emoji:
+        logger.warn(f"No such pack: {name}, ignoring")
+    for emoji in pack_emoji:
+        if unselect:
+            selected.pop(emoji.shortcode, None)
+        else:
+            selected[emoji.shortcode] = emoji
+
+
+TOKEN_HANDLERS = {
+    "pack": apply_pack,
+    "emoji": apply_emoji,
+}
+
+
+def apply_token(token: str, unselect: bool = False):
+    """Select or unselect a single emoji or pack from a query token."""
+    prefix, sep, name = token.partition(":")
+    if sep and prefix in TOKEN_HANDLERS:
+        TOKEN_HANDLERS[prefix](name, unselect)
+    else:
+        # No (known) prefix; treat the whole token as a shortcode.
+        apply_emoji(token, unselect)
+
+
 while True:
     while True:
         _query = input("> ")
@@ -94,53 +132,22 @@ while True:
                     while command in query:
                         query.remove(command)
             if query[0] == "unselect":
-                for shortcode in query[1:]:
-                    if shortcode.startswith("pack:"):
-                        for pack_sc in [
-                            e.shortcode for e in emoji_categorized[shortcode[5:]]
-                        ]:
-                            try:
-                                del selected[pack_sc]
-                            except KeyError:
-                                pass
-                    else:
-                        try:
-                            del selected[shortcode]
-                        except KeyError:
-                            logger.warn(f"Not selected: {shortcode}, ignoring")
+                for token in query[1:]:
+                    apply_token(token, unselect=True)
             else:
-                for shortcode in query:
-                    if shortcode.startswith("pack:"):
-                        for emoji in emoji_categorized[shortcode[5:]]:
-                            selected[emoji.shortcode] = emoji
-                    else:
-                        if shortcode.startswith("emoji:"):
-                            shortcode = shortcode[6:]
-                        try:
-                            selected[shortcode] = all_emoji_shortcodes[shortcode]
-                        except KeyError:
-                            logger.warn(f"No such emoji: {shortcode}, ignoring")
+                for token in query:
+                    apply_token(token)
         else:
             if query[0] == "confirm":
                 break
             elif query[0] == "all":
-                selected = dict([(e.shortcode, e) for e in all_emoji])
+                selected = {e.shortcode: e for e in all_emoji}
             elif query[0] == "none":
                 selected = {}
             elif query[0] == "quit":
                 quit(0)
             else:
-                shortcode = query[0]
-                if shortcode.startswith("pack:"):
-                    for emoji in emoji_categorized[shortcode[5:]]:
-                        selected[emoji.shortcode] = emoji
-                else:
-                    if shortcode.startswith("emoji:"):
-                        shortcode = shortcode[6:]
-                    try:
-                        selected[shortcode] = all_emoji_shortcodes[shortcode]
-                    except KeyError:
-                        logger.warn(f"No such emoji: {shortcode}, ignoring")
+                apply_token(query[0])
 
         logger.info(f"{len(selected)} emoji selected.")
 
@@ -152,63 +159,65 @@ while True:
 
 logger.info("Downloading emoji...")
 
-h = None
-for handler in logger.handlers:
-    if handler.name == "my_handler":
-        h = handler
-
 packs = {}
+download_queue = []
+download_shortcodes = {}
 
-for emoji in selected.values():
-    h.terminator = ""
-    logger.info(f"{emoji.shortcode}...")
-    h.terminator = "\n"
+# Scan each category directory once up front, instead of stat-ing every
+# emoji's target path individually.
+existing_files = {}
+for category in {e.category_path for e in selected.values()}:
+    category_dir = os.path.join(output_dir, category)
+    if os.path.isdir(category_dir):
+        existing_files[category] = {entry.name for entry in os.scandir(category_dir)}
 
+for emoji in selected.values():
     if args.original:
         url = emoji.original_url or emoji.static_url
     else:
         url = emoji.static_url or emoji.original_url
 
     emoji_filename = emoji.shortcode + os.path.splitext(url)[1]
-    target_path = os.path.join(
-                output_dir,
-                emoji.category if emoji.category else "",
-                emoji_filename,
-            )
-
-    if emoji.category in packs:
-        packs[emoji.category]["files"][emoji.shortcode] = emoji_filename
+    target_path = os.path.join(output_dir, emoji.category_path, emoji_filename)
+
+    if emoji.category_path in packs:
+        packs[emoji.category_path]["files"][emoji.shortcode] = emoji_filename
     else:
-        packs[emoji.category] = {}
-        packs[emoji.category]["files"] = {emoji.shortcode: emoji_filename}
+        packs[emoji.category_path] = {}
+        packs[emoji.category_path]["files"] = {emoji.shortcode: emoji_filename}
         if emoji.pack and "pack" in emoji.pack and emoji.pack["pack"]:
-            packs[emoji.category]["pack"] = emoji.pack["pack"]
+            packs[emoji.category_path]["pack"] = emoji.pack["pack"]
         else:
-            packs[emoji.category]["pack"] = {
-                "description": pack_name,
+            packs[emoji.category_path]["pack"] = {
+                "description": emoji.category_path,
                 "homepage": instance.url,
                 "share-files": True,
             }
 
-    if os.path.exists(target_path):
-        print(" already downloaded")
+    if emoji_filename in existing_files.get(emoji.category_path, ()):
+        logger.info(f"{emoji.shortcode}... already downloaded")
         continue
 
-    try:
-        request_download(
-            url, target_path
-        )
-    except RequestError as e:
-        print(" ✗")
-        logger.warn(f"Server returned error: {int(str(e))}")
-        continue
+    download_queue.append((url, target_path))
+    download_shortcodes[target_path] = emoji.shortcode
+
+# Create the category directories up front so that the download threads
+# don't race each other trying to create them.
+for category in packs:
+    os.makedirs(os.path.join(output_dir, category), exist_ok=True)
+
+for target, error in request_download_many(download_queue):
+    shortcode = download_shortcodes[target]
+    if error:
+        logger.info(f"{shortcode}... ✗")
+        logger.warn(f"Server returned error: {int(str(error))}")
     else:
-        print(" ✓")
+        logger.info(f"{shortcode}... ✓")
 
 logger.info("Writing pack.json files...")
 for pack_name, pack_data in packs.items():
-    with open(os.path.join(output_dir, pack_name, "pack.json"), "w") as f:
-        json.dump(pack_data, f)
+    with open(os.path.join(output_dir, pack_name, "pack.json"), "wb") as f:
+        f.write(json_dumps(pack_data))
 
 logger.info("Done! Enjoy your emoji!")
 
@@ -1,11 +1,11 @@
 # SPDX-License-Identifier: MIT
 """Code for emoji parsing."""
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from typing import Optional
 
-@dataclass
+@dataclass(slots=True)
 class Emoji:
     """Class representing a single emoji."""
 
@@ -23,5 +23,16 @@ class Emoji:
     #: Category/pack that this emoji belongs to.
     category: str
 
-    #: pack.json data.
-    pack: Optional[dict]
+    #: pack.json data. Only available on Pleroma instances.
+    pack: Optional[dict] = None
+
+    #: Category name as shown in listings; "(uncategorized)" if unset.
+    category_display: str = field(init=False)
+
+    #: Category component of the download path; empty if unset.
+    category_path: str = field(init=False)
+
+    def __post_init__(self):
+        """Precompute the derived category fields."""
+        self.category_display = self.category or "(uncategorized)"
+        self.category_path = self.category or ""
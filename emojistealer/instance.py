@@ -7,12 +7,13 @@ from . import logger
 from .emoji import Emoji
 from .request import request_get, RequestError
 
-import requests.exceptions
-from functools import cached_property
+from functools import cached_property, lru_cache
+from json import JSONDecodeError
 from urllib.parse import urljoin, urlparse
-from typing import List, Self, Union
+from typing import List, Optional, Self, Tuple, Union
 import os.path
 
+@lru_cache(maxsize=256)
 def get_base_url(url: str) -> str:
     """
     Clean up a link and extract the scheme and domain from it.
@@ -37,21 +38,51 @@ def get_base_url(url: str) -> str:
     return f"{scheme}://{domain}"
 
 
+def _check_emoji_fields(shortcode: str, url: str) -> bool:
+    """Check an emoji API entry for required fields, warning if unusable."""
+    if not shortcode:
+        logger.warn("Missing shortcode for emoji")
+        return False
+    if not url:
+        logger.warn(f"Missing URL for emoji {shortcode}")
+        return False
+    return True
+
+
 class Instance:
     """
     Represents a Fediverse instance. Subclasses of this class represent specific
     server software (Mastodon, Pleroma/Akkoma, Misskey etc).
     """
 
-    def __init__(self, url: str):
+    def __init__(self, url: str, probe: Optional[Tuple[int, Optional[dict]]] = None):
         """
         Initialize the Instance object.
 
         :params url: URL of the instance.
+        :params probe: Optional result of :func:`Instance._probe` for this
+                       instance, to avoid re-fetching it.
         """
         #: Base URL of the instance, with the https prefix.
         self.url = get_base_url(url)
 
+    @staticmethod
+    def _probe(url: str) -> Tuple[int, Optional[dict]]:
+        """
+        Fetch /api/v1/instance for instance type detection.
+
+        :param url: Base URL of the instance, as returned by
+                    :func:`get_base_url`.
+        :returns: A (status, data) tuple, where status is the HTTP status
+                  code and data is the parsed JSON response, or None if the
+                  request failed.
+        """
+        try:
+            data = request_get(urljoin(url, "/api/v1/instance"), parse_json=True)
+        except RequestError as e:
+            return (int(str(e)), None)
+        return (200, data)
+
     @classmethod
     def create_for_url(cls, url: str) -> Self:
         """
@@ -61,9 +92,13 @@ class Instance:
         """
         _url = get_base_url(url)
 
+        # Fetch /api/v1/instance once and let every instance type match
+        # against the result, instead of each doing its own request.
+        probe = cls._probe(_url)
+
         for instance_type in cls.instance_types:
-            if instance_type.matches_url(_url):
-                return instance_type(_url)
+            if instance_type.matches_url(_url, probe):
+                return instance_type(_url, probe=probe)
 
         raise ValueError(f"Cannot identify instance type for {_url}")
 
@@ -76,11 +111,13 @@ class InstanceMastodon(Instance):
     __software__ = "Mastodon"
 
     @classmethod
-    def matches_url(cls, url: str) -> bool:
+    def matches_url(cls, url: str, probe: Tuple[int, Optional[dict]]) -> bool:
         """
         Check if the instance with the provided URL is of this type.
 
-        :param url: URL of the instance to check for.
+        :param url: Base URL of the instance to check for, as returned by
+                    :func:`get_base_url`.
+        :param probe: Result of :func:`Instance._probe` for this URL.
         """
         return True  # TODO: Add "Mastodon-like" type
 
@@ -91,34 +128,26 @@ class InstanceMastodon(Instance):
         """
         Get the emoji of this instance as an EmojiList.
         """
-        emoji_list = []
-
         try:
             req = request_get(
                 urljoin(self.url, "/api/v1/custom_emojis"), parse_json=True
             )
         except RequestError:
-            return emoji_list
-
-        for emoji in req:
-            if not emoji.get("shortcode", ""):
-                logger.warn(f"Missing shortcode for emoji")
-                continue
-
-            if not emoji.get("url", "") and not emoji.get("static_url", ""):
-                logger.warn(f"Missing URL for emoji {emoji['shortcode']}")
-                continue
-
-            emoji_list.append(
-                Emoji(
-                    shortcode=emoji["shortcode"],
-                    category=InstancePleroma._category_fixup(emoji.get("category")),
-                    original_url=emoji.get("url", ""),
-                    static_url=emoji.get("static_url", ""),
-                )
+            return []
+
+        return [
+            Emoji(
+                shortcode=emoji["shortcode"],
+                category=InstancePleroma._category_fixup(emoji.get("category")),
+                original_url=emoji.get("url", ""),
+                static_url=emoji.get("static_url", ""),
             )
-
-        return emoji_list
+            for emoji in req
+            if _check_emoji_fields(
+                emoji.get("shortcode", ""),
+                emoji.get("url", "") or emoji.get("static_url", ""),
+            )
+        ]
 
 
 class InstancePleroma(Instance):
@@ -128,37 +157,33 @@ class InstancePleroma(Instance):
 
     __software__ = "Pleroma"
 
-    def __init__(self, url: str):
-        super().__init__(url)
+    def __init__(self, url: str, probe: Optional[Tuple[int, Optional[dict]]] = None):
+        super().__init__(url, probe=probe)
+
+        if probe is None:
+            probe = Instance._probe(self.url)
+        req = probe[1]
 
+        is_akkoma = False
         try:
-            req = request_get(urljoin(self.url, "/api/v1/instance"), parse_json=True)
-        except RequestError:
+            is_akkoma = "akkoma_api" in req["pleroma"]["metadata"]["features"]
+        except (KeyError, TypeError):
             pass
-        else:
-            is_akkoma = False
-            try:
-                is_akkoma = "akkoma_api" in req["pleroma"]["metadata"]["features"]
-            except KeyError:
-                pass
 
         if is_akkoma:
             self.__software__ = "Akkoma"
 
     @classmethod
-    def matches_url(cls, url: str) -> bool:
+    def matches_url(cls, url: str, probe: Tuple[int, Optional[dict]]) -> bool:
         """
         Check if the instance with the provided URL is of this type.
 
-        :param url: URL of the instance to check for.
+        :param url: Base URL of the instance to check for, as returned by
+                    :func:`get_base_url`.
+        :param probe: Result of :func:`Instance._probe` for this URL.
         """
-        try:
-            req = request_get(
-                urljoin(get_base_url(url), "/api/v1/instance"), parse_json=True
-            )
-        except RequestError:
-            return False
-        return "pleroma" in req
+        req = probe[1]
+        return req is not None and "pleroma" in req
 
     @cached_property
     def all_emoji(self) -> List[Emoji]:
@@ -184,15 +209,15 @@ class InstancePleroma(Instance):
                 logger.warn(f"Missing URL for emoji {shortcode}")
                 continue
 
-            category = None
-            for tag in emoji.get("tags"):
-                if tag.startswith("pack:"):
-                    category = tag[5:]
-                    break
+            tags = emoji.get("tags") or ()
+            category = next(
+                (t.partition("pack:")[2] for t in tags if t.startswith("pack:")),
+                None,
+            )
 
             # If URL is not prefixed with instance domain, do it manually
             url = emoji["image_url"]
-            if not url.startswith("http://") or url.startswith("https://"):
+            if not url.startswith(("http://", "https://")):
                 url = urljoin(self.url, url)
 
             # Try to find pack.json for additional pack metadata
@@ -202,11 +227,10 @@ class InstancePleroma(Instance):
                 emoji_dirnames.append(pack_name)
                 pack = None
                 try:
-                    print(url, dirname, urljoin(dirname + "/", "pack.json"))
                     pack_req = request_get(
                         urljoin(dirname + "/", "pack.json"), parse_json=True
                     )
-                except (RequestError, requests.exceptions.JSONDecodeError):
+                except (RequestError, JSONDecodeError):
                     if pack_name != "emoji":
                         logger.info(f"Did not find pack.json for {pack_name}")
                     pass
@@ -245,55 +269,37 @@ class InstanceMisskey(Instance):
     __software__ = "Misskey"
 
     @classmethod
-    def matches_url(cls, url: str) -> bool:
+    def matches_url(cls, url: str, probe: Tuple[int, Optional[dict]]) -> bool:
         """
         Check if the instance with the provided URL is of this type.
 
-        :param url: URL of the instance to check for.
+        :param url: Base URL of the instance to check for, as returned by
+                    :func:`get_base_url`.
+        :param probe: Result of :func:`Instance._probe` for this URL.
         """
         # TODO better check
-        try:
-            req = request_get(
-                urljoin(get_base_url(url), "/api/v1/instance"), parse_json=True
-            )
-        except RequestError as e:
-            e = int(str(e))
-            if e == 404:
-                return True
-
-        return False
+        return probe[0] == 404
 
     @cached_property
     def all_emoji(self) -> List[Emoji]:
         """
         Get the emoji of this instance as an EmojiList.
         """
-        emoji_list = []
-
         try:
             req = request_get(urljoin(self.url, "/api/emojis"), parse_json=True)
         except RequestError:
-            return emoji_list
-
-        for emoji in req.get("emojis", []):
-            if not emoji.get("name", ""):
-                logger.warn(f"Missing shortcode for emoji")
-                continue
-
-            if not emoji.get("url", ""):
-                logger.warn(f"Missing URL for emoji {emoji['shortcode']}")
-                continue
-
-            emoji_list.append(
-                Emoji(
-                    shortcode=emoji["name"],
-                    category=emoji["category"] or None,
-                    original_url=emoji["url"],
-                    static_url=emoji["url"],
-                )
+            return []
+
+        return [
+            Emoji(
+                shortcode=emoji["name"],
+                category=emoji["category"] or None,
+                original_url=emoji["url"],
+                static_url=emoji["url"],
             )
-
-        return emoji_list
+            for emoji in req.get("emojis", [])
+            if _check_emoji_fields(emoji.get("name", ""), emoji.get("url", ""))
+        ]
 
 
 Instance.instance_types = [InstancePleroma, InstanceMisskey, InstanceMastodon]
@@ -3,24 +3,85 @@
 
 from . import VERSION, logger
 
-import requests
-from pyrate_limiter import Duration, RequestRate, Limiter
-from requests import Session
-from requests_cache import CacheMixin
-from requests_ratelimiter import LimiterSession, LimiterMixin
+import functools
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from os import PathLike
-import os.path
-from pathlib import Path
+import shutil
+from typing import Iterable, Tuple
+
+# orjson parses large emoji lists noticeably faster than the stdlib;
+# fall back to the stdlib if it's not installed.
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+
+@functools.lru_cache(maxsize=1)
+def _get_sessions():
+    """
+    Create the cached and non-cached request sessions on first use.
+
+    requests, requests_cache and the rate limiter take a noticeable
+    amount of time to import, so they are only pulled in here, keeping
+    them off the CLI startup path (argument parsing, --help).
+
+    :returns: A (cached session, non-cached session) tuple.
+    """
+    from pyrate_limiter import Duration, RequestRate, Limiter
+    from requests import Session
+    from requests.adapters import HTTPAdapter, Retry
+    from requests_cache import CacheMixin
+    from requests_ratelimiter import LimiterSession, LimiterMixin
+
+    class CachedLimiterSession(CacheMixin, LimiterMixin, Session):
+        """Requests session that combines caching and ratelimiting."""
+
+    limiter = Limiter(RequestRate(10, Duration.SECOND * 3))
+
+    # Cache API responses for up to an hour (or however long the server says
+    # they are fresh), so repeat runs against the same instance don't re-fetch
+    # the entire emoji list.
+    req_session = CachedLimiterSession(
+        "emojistealer_cache",
+        backend="sqlite",
+        expire_after=3600,
+        cache_control=True,
+        stale_if_error=True,
+        limiter=limiter,
+    )
 
+    # Downloads get their own, more generous per-host bucket: static files
+    # are much cheaper for servers than API calls, and sharing the strict
+    # API limiter would throttle parallel downloads to ~3 files a second.
+    req_nocache_session = LimiterSession(per_second=20, per_host=True)
+
+    # The download session gets a larger connection pool than the requests
+    # default of 10, so that parallel downloads keep reusing the same
+    # connections instead of re-doing the TCP/TLS handshake for each file.
+    download_adapter = HTTPAdapter(
+        pool_connections=64,
+        pool_maxsize=64,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=(502, 503, 504),
+            # Hand the final 5xx response back instead of raising
+            # RetryError, so raise_for_status() turns it into the
+            # RequestError that request_download's callers expect.
+            raise_on_status=False,
+        ),
+    )
+    req_nocache_session.mount("https://", download_adapter)
+    req_nocache_session.mount("http://", download_adapter)
 
-class CachedLimiterSession(CacheMixin, LimiterMixin, Session):
-    """Requests session that combines caching and ratelimiting."""
+    return (req_session, req_nocache_session)
 
 
-limiter = Limiter(RequestRate(10, Duration.SECOND * 3))
+def _get_session(no_cache: bool = False):
+    """Get the session for making requests."""
+    return _get_sessions()[1 if no_cache else 0]
 
-req_session = CachedLimiterSession("emojistealer_cache", expire_after=180, limiter=limiter)
-req_nocache_session = LimiterSession(limiter=limiter)
 
 HEADERS = {
     "User-Agent": "emojistealer {VERSION} (https://github.com/knuxify/emojistealer)"
@@ -32,9 +93,7 @@ class RequestError(Exception):
 
 
 def request_get(url: str, parse_json: bool = False, no_cache: bool = False):
-    session = req_session
-    if no_cache:
-        session = req_nocache_session
+    session = _get_session(no_cache=no_cache)
 
     req = session.get(
         url,
@@ -46,25 +105,55 @@ def request_get(url: str, parse_json: bool = False, no_cache: bool = False):
         raise RequestError(req.status_code)
 
     if parse_json:
-        return req.json()
+        return json_loads(req.content)
 
     return req.text
 
 
 def request_download(url: str, target: PathLike):
-    """Downloads a file to the given target location."""
-    basedir = Path(os.path.dirname(target))
-    if basedir.is_file():
-        raise ValueError("Base directory already exists and is a file")
+    """
+    Downloads a file to the given target location.
 
-    if not basedir.is_dir():
-        basedir.mkdir(parents=True)
+    The target's directory must already exist; callers are expected to
+    create it up front (once per directory, not once per file).
+    """
+    import requests.exceptions
 
     try:
-        with req_nocache_session.get(url, headers=HEADERS, stream=True) as r:
+        with _get_session(no_cache=True).get(url, headers=HEADERS, stream=True) as r:
             r.raise_for_status()
+            # Let urllib3 handle any content encoding, then hand the copy
+            # off to shutil, which runs it in larger chunks without a
+            # Python-level loop.
+            r.raw.decode_content = True
             with open(target, "wb") as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
+                shutil.copyfileobj(r.raw, f, length=65536)
     except requests.exceptions.HTTPError as e:
-        raise RequestError(e.status_code)
+        raise RequestError(e.response.status_code)
+
+
+def request_download_many(downloads: Iterable[Tuple[str, PathLike]], max_workers: int = 16):
+    """
+    Download multiple files in parallel, reusing the session's connections.
+
+    :param downloads: Iterable of (url, target) tuples, as accepted by
+                      :func:`request_download`.
+    :param max_workers: How many downloads to run at once.
+    :returns: Generator yielding (target, error) tuples as the downloads
+              finish, where error is the RequestError raised by the
+              download, or None if it succeeded.
+    """
+
+    def _download_one(url: str, target: PathLike):
+        try:
+            request_download(url, target)
+        except RequestError as e:
+            return (target, e)
+        return (target, None)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_download_one, url, target) for url, target in downloads
+        ]
+        for future in as_completed(futures):
+            yield future.result()
@@ -5,3 +5,19 @@ colors = {
     "bold": "\033[1m",
     "reset": "\033[0m",
 }
+
+# Serialize with orjson if it's installed; it returns ready-to-write bytes
+# in one go. The stdlib fallback matches that interface.
+try:
+    from orjson import OPT_INDENT_2, dumps as _orjson_dumps
+
+    def json_dumps(data) -> bytes:
+        """Serialize data to indented JSON bytes."""
+        return _orjson_dumps(data, option=OPT_INDENT_2)
+
+except ImportError:
+    import json
+
+    def json_dumps(data) -> bytes:
+        """Serialize data to indented JSON bytes."""
+        return json.dumps(data, indent=2).encode("utf-8")